@@ -1,5 +1,7 @@
+import threading
+import time
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional
+from typing import Any, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
 
 from models import BaseClusterSecret
 
@@ -18,25 +20,215 @@ class Cache(ABC):
         pass
 
     @abstractmethod
-    def all_cluster_secret(self) -> List[BaseClusterSecret]:
+    def all_cluster_secret(self) -> Sequence[BaseClusterSecret]:
         pass
 
+    @abstractmethod
+    def get_by_source(self, name: str, namespace: str) -> List[BaseClusterSecret]:
+        """Returns the ClusterSecrets reading their data from the secret 'name' in 'namespace' (valueFrom)"""
+        pass
+
+    @abstractmethod
+    def get_by_name(self, name: str) -> Optional[BaseClusterSecret]:
+        """Returns the ClusterSecret with the given name (names are unique, ClusterSecrets are cluster scoped)"""
+        pass
+
+    def bulk_load(self, cluster_secrets: Iterable[BaseClusterSecret]):
+        """Replaces the content of the cache with the given ClusterSecrets"""
+        for cluster_secret in self.all_cluster_secret():
+            self.remove_cluster_secret(cluster_secret.uid)
+        for cluster_secret in cluster_secrets:
+            self.set_cluster_secret(cluster_secret)
+
     def has_cluster_secret(self, uid: str) -> bool:
         return self.get_cluster_secret(uid) is not None
 
 
+def source_key(cluster_secret: BaseClusterSecret) -> Optional[Tuple[str, str]]:
+    """Returns the (name, namespace) of the valueFrom source secret, None if the data is inline"""
+    ref = (cluster_secret.data or {}).get('valueFrom', {}).get('secretKeyRef', {})
+    name = ref.get('name')
+    namespace = ref.get('namespace')
+    if name is None or namespace is None:
+        return None
+    return name, namespace
+
+
+class _CacheState(NamedTuple):
+    """Immutable view of the MemoryCache content, replaced as a whole on every mutation"""
+    csecs: Dict[str, BaseClusterSecret]
+    # Secondary indexes: (source name, source namespace) -> uids and name -> uid
+    by_source: Dict[Tuple[str, str], FrozenSet[str]]
+    by_name: Dict[str, str]
+    snapshot: Tuple[BaseClusterSecret, ...]
+
+
 class MemoryCache(Cache):
+    """Copy-on-write cache: readers use the current state without locking,
+    mutators build a new state and swap it in under a lock.
+    """
+
     def __init__(self) -> None:
-        self.csecs: Dict[str, BaseClusterSecret] = {}
+        self._lock = threading.Lock()
+        self._state = _CacheState({}, {}, {}, ())
 
     def get_cluster_secret(self, uid: str) -> Optional[BaseClusterSecret]:
-        return self.csecs.get(uid, None)
+        return self._state.csecs.get(uid, None)
 
     def set_cluster_secret(self, cluster_secret: BaseClusterSecret):
-        self.csecs[cluster_secret.uid] = cluster_secret
+        cluster_secret.invalidate_kubernetes_body()
+        with self._lock:
+            state = self._state
+            csecs = dict(state.csecs)
+            by_source = dict(state.by_source)
+            by_name = dict(state.by_name)
+
+            old = csecs.get(cluster_secret.uid)
+            if old is not None:
+                _unindex(by_source, by_name, old)
+            csecs[cluster_secret.uid] = cluster_secret
+            _index(by_source, by_name, cluster_secret)
+
+            self._state = _CacheState(csecs, by_source, by_name, tuple(csecs.values()))
 
     def remove_cluster_secret(self, uid: str):
-        self.csecs.pop(uid)
+        with self._lock:
+            state = self._state
+            csecs = dict(state.csecs)
+            by_source = dict(state.by_source)
+            by_name = dict(state.by_name)
+
+            cluster_secret = csecs.pop(uid)
+            _unindex(by_source, by_name, cluster_secret)
+
+            self._state = _CacheState(csecs, by_source, by_name, tuple(csecs.values()))
+
+    def bulk_load(self, cluster_secrets: Iterable[BaseClusterSecret]):
+        # The whole state is built aside and swapped in once
+        csecs: Dict[str, BaseClusterSecret] = {}
+        by_source: Dict[Tuple[str, str], FrozenSet[str]] = {}
+        by_name: Dict[str, str] = {}
+        for cluster_secret in cluster_secrets:
+            cluster_secret.invalidate_kubernetes_body()
+            old = csecs.get(cluster_secret.uid)
+            if old is not None:
+                _unindex(by_source, by_name, old)
+            csecs[cluster_secret.uid] = cluster_secret
+            _index(by_source, by_name, cluster_secret)
+
+        with self._lock:
+            self._state = _CacheState(csecs, by_source, by_name, tuple(csecs.values()))
+
+    def all_cluster_secret(self) -> Sequence[BaseClusterSecret]:
+        return self._state.snapshot
+
+    def get_by_source(self, name: str, namespace: str) -> List[BaseClusterSecret]:
+        state = self._state
+        return _lookup(state, state.by_source.get((name, namespace)))
+
+    def get_by_name(self, name: str) -> Optional[BaseClusterSecret]:
+        state = self._state
+        uid = state.by_name.get(name)
+        if uid is None:
+            return None
+        return state.csecs.get(uid)
+
+
+def _lookup(state: _CacheState, uids: Optional[FrozenSet[str]]) -> List[BaseClusterSecret]:
+    if not uids:
+        return []
+    return [state.csecs[uid] for uid in uids]
+
+
+def _index(by_source: Dict, by_name: Dict, cluster_secret: BaseClusterSecret):
+    by_name[cluster_secret.name] = cluster_secret.uid
+    key = source_key(cluster_secret)
+    if key is not None:
+        _add(by_source, key, cluster_secret.uid)
+
+
+def _unindex(by_source: Dict, by_name: Dict, cluster_secret: BaseClusterSecret):
+    # A re-created ClusterSecret (new uid) may already own the name
+    if by_name.get(cluster_secret.name) == cluster_secret.uid:
+        del by_name[cluster_secret.name]
+    key = source_key(cluster_secret)
+    if key is not None:
+        _discard(by_source, key, cluster_secret.uid)
+
+
+def _add(index: Dict, key, uid: str):
+    # Index entries are frozensets, replaced instead of mutated so published states never change
+    index[key] = index.get(key, frozenset()) | {uid}
+
+
+def _discard(index: Dict, key, uid: str):
+    uids = index.get(key, frozenset()) - {uid}
+    if uids:
+        index[key] = uids
+    else:
+        index.pop(key, None)
+
+
+class NamespaceCache:
+    """Names of all namespaces in the Cluster, loaded once and kept current by the namespace watcher"""
+
+    def __init__(self) -> None:
+        self._names: Optional[Set[str]] = None
+
+    def is_loaded(self) -> bool:
+        return self._names is not None
+
+    def load(self, names: Iterable[str]):
+        self._names = set(names)
+
+    def clear(self):
+        self._names = None
+
+    def add(self, name: str):
+        # Nothing to track until loaded, the first lookup will list all namespaces anyway
+        if self._names is not None:
+            self._names.add(name)
+
+    def remove(self, name: str):
+        if self._names is not None:
+            self._names.discard(name)
+
+    def names(self) -> List[str]:
+        return sorted(self._names or ())
+
+
+class TTLCache:
+    """Small key/value cache whose entries expire 'ttl' seconds after being set.
+    Safe to use from kopf executor threads and the event loop at the same time.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 1024) -> None:
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._items: Dict[Any, Tuple[float, Any]] = {}
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._items.get(key)
+        if item is None or item[0] <= time.monotonic():
+            return default
+        return item[1]
+
+    def set(self, key, value):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._items) >= self.maxsize:
+                # Drop expired entries first, then the oldest ones
+                self._items = {k: v for k, v in self._items.items() if v[0] > now}
+                while len(self._items) >= self.maxsize:
+                    self._items.pop(next(iter(self._items)))
+            self._items[key] = (now + self.ttl, value)
+
+    def pop(self, key):
+        with self._lock:
+            self._items.pop(key, None)
 
-    def all_cluster_secret(self) -> List[BaseClusterSecret]:
-        return list(self.csecs.values())
+    def clear(self):
+        with self._lock:
+            self._items.clear()
@@ -9,6 +9,8 @@ VERSION_ANNOTATION = 'clustersecret.io/version'
 
 CLUSTER_SECRET_LABEL = "clustersecret.io"
 
+FIELD_MANAGER = 'clustersecret'
+
 BLOCKED_ANNOTATIONS = ["kopf.zalando.org", "kubectl.kubernetes.io"]
 
 BLOCKED_LABELS = ["app.kubernetes.io"]
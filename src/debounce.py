@@ -0,0 +1,60 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+class Debouncer:
+    """Coalesces bursts of events.
+
+    Events submitted within `delay` seconds of the first one of a burst are collected by a single
+    worker task, de-duplicated by key (the last value wins) and handed to `process` as one batch.
+    Callers await the outcome of the batch holding their event, so errors still reach kopf.
+    """
+
+    def __init__(
+            self,
+            process: Callable[[Dict[Hashable, Any]], Awaitable[None]],
+            delay: float,
+    ) -> None:
+        self._process = process
+        self._delay = delay
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Starts the worker on the running event loop (no-op when already running there)"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._worker is not None and not self._worker.done():
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._worker = loop.create_task(self._run())
+
+    async def submit(self, key: Hashable, value: Any = None):
+        """Queues an event and waits until the batch containing it has been processed"""
+        self.start()
+        future = self._loop.create_future()
+        self._queue.put_nowait((key, value, future))
+        await future
+
+    async def _run(self):
+        while True:
+            batch: List[Tuple[Hashable, Any, asyncio.Future]] = [await self._queue.get()]
+            await asyncio.sleep(self._delay)
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+
+            items = {key: value for key, value, _ in batch}
+            try:
+                await self._process(items)
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_result(None)
@@ -1,21 +1,32 @@
+import asyncio
+import dataclasses
+import functools
 import logging
-import re
 import sys
-from typing import Any, Dict, List, Optional, Mapping
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Mapping, Set, Tuple
 
 import kopf
 from kubernetes import client, config
 from kubernetes.client import exceptions
 
-from cache import Cache, MemoryCache
+from cache import Cache, MemoryCache, NamespaceCache, TTLCache
+from debounce import Debouncer
 from kubernetes_utils import delete_secret, get_ns_list, sync_secret, patch_clustersecret_status, get_custom_objects_by_kind
 from consts import CREATE_BY_ANNOTATION, CREATE_BY_AUTHOR
-from models import BaseClusterSecret
+from models import BaseClusterSecret, cluster_secret_adapter
 
 # In-memory dictionary for all ClusterSecrets in the Cluster. UID -> ClusterSecret Body
 csecs_cache: Cache = MemoryCache()
 
-from os_utils import in_cluster
+# Names of all namespaces in the Cluster, maintained from namespace events instead of listing them on every event
+namespaces_cache = NamespaceCache()
+
+# Namespace phases read by self-healing, kept for a short time to collapse bursts of deletes in one namespace
+namespace_phases_cache = TTLCache(ttl=2.0, maxsize=1024)
+_NOT_CACHED = object()
+
+from os_utils import get_event_debounce, in_cluster
 
 if "unittest" not in sys.modules:
     # Loading kubeconfig
@@ -26,24 +37,100 @@ if "unittest" not in sys.modules:
         # Loading using the local kubevonfig.
         config.load_kube_config()
 
-v1 = client.CoreV1Api()
-custom_objects_api = client.CustomObjectsApi()
+
+def _api_client(pool_maxsize: int) -> client.ApiClient:
+    """Returns an ApiClient with its own connection pool"""
+    configuration = client.Configuration.get_default_copy()
+    configuration.connection_pool_maxsize = pool_maxsize
+    return client.ApiClient(configuration)
+
+
+# Reads, secret writes and ClusterSecret status patches use separate connection pools,
+# so self-healing and sync writes do not queue behind reads (and the other way around).
+v1 = client.CoreV1Api(_api_client(pool_maxsize=20))
+v1_write = client.CoreV1Api(_api_client(pool_maxsize=20))
+custom_objects_api = client.CustomObjectsApi(_api_client(pool_maxsize=4))
+
+# Bounded pool for the per-namespace API calls, caps the pressure put on the apiserver.
+_SYNC_EXECUTOR = ThreadPoolExecutor(max_workers=10)
+
+# Separate pool for the ClusterSecret status patches, so they never wait behind namespace syncs.
+_API_EXECUTOR = ThreadPoolExecutor(max_workers=4)
+
+
+def get_all_namespaces() -> List[str]:
+    """Returns the names of all namespaces, listing them from the API only when not cached yet
+    """
+    if not namespaces_cache.is_loaded():
+        namespaces_cache.load(ns.metadata.name for ns in v1.list_namespace().items)
+    return namespaces_cache.names()
+
+
+def get_namespace_phase(namespace: str) -> Optional[str]:
+    """Returns the phase of a namespace (empty if unknown), None if it does not exist.
+    Results are cached for a short time.
+    """
+    phase = namespace_phases_cache.get(namespace, _NOT_CACHED)
+    if phase is _NOT_CACHED:
+        try:
+            phase = v1.read_namespace(name=namespace).status.phase or ''
+        except exceptions.ApiException as e:
+            if e.status != 404:
+                raise
+            phase = None
+        namespace_phases_cache.set(namespace, phase)
+    return phase
+
+
+async def _fan_out(
+    logger: logging.Logger,
+    func: Callable[..., Any],
+    namespaces: Iterable[str],
+    *args,
+):
+    """Runs func(logger, namespace, *args) concurrently for every namespace on the sync executor.
+    All namespaces are processed even if some of them fail, the first error is re-raised afterwards
+    so kopf can retry the handler.
+    """
+    # get_ns_list may return a namespace once per matching pattern, concurrent syncs of one namespace would race
+    namespaces = list(dict.fromkeys(namespaces))
+    loop = asyncio.get_running_loop()
+    tasks = [loop.run_in_executor(_SYNC_EXECUTOR, func, logger, ns, *args) for ns in namespaces]
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    errors = []
+    for ns, result in zip(namespaces, results):
+        if isinstance(result, Exception):
+            logger.error('Error in %s for namespace %s: %s', getattr(func, '__name__', func), ns, result)
+            errors.append(result)
+    if errors:
+        raise errors[0]
+
+
+def _syncedns(body: Mapping[str, Any]) -> Tuple[str, ...]:
+    """Returns the synced namespaces stored in the ClusterSecret status by create_fn
+    """
+    try:
+        return tuple(body['status']['create_fn']['syncedns'] or ())
+    except (KeyError, TypeError):
+        return ()
 
 
-def is_noise_secret(name: str, labels: kopf.Labels) -> bool:
-    """Returns True if the secret is considered 'noise' (Helm, GitLab Runner, etc.)
+async def _patch_status(logger: logging.Logger, name: str, syncedns: Iterable[str]):
+    """Patches the synced namespaces of a ClusterSecret without blocking the event loop
     """
-    if name.startswith('sh.helm.release.v1.'):
-        return True
-    if labels.get('owner') == 'helm':
-        return True
-    if re.match(r'^runner-.*-project-.*-concurrent-.*$', name):
-        return True
-    return False
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(_API_EXECUTOR, functools.partial(
+        patch_clustersecret_status,
+        logger=logger,
+        name=name,
+        new_status={'create_fn': {'syncedns': sorted(syncedns)}},
+        custom_objects_api=custom_objects_api,
+    ))
 
 
 @kopf.on.delete('clustersecret.io', 'v1', 'clustersecrets')
-def on_delete(
+async def on_delete(
     body: Dict[str, Any],
     uid: str,
     name: str,
@@ -53,19 +140,20 @@ def on_delete(
     # Delete from memory FIRST to prevent self-healing race
     try:
         csecs_cache.remove_cluster_secret(uid)
-        logger.debug(f'csec {uid} deleted from memory ok')
+        logger.debug('csec %s deleted from memory ok', uid)
     except KeyError as k:
-        logger.info(f'This csec was not found in memory, maybe it was created in another run: {k}')
-    logger.debug(f'csec {uid} deleted from memory ok')
+        logger.info('This csec was not found in memory, maybe it was created in another run: %s', k)
+    logger.debug('csec %s deleted from memory ok', uid)
+
+    syncedns = _syncedns(body)
 
-    syncedns = body.get('status', {}).get('create_fn', {}).get('syncedns', [])
-    for ns in syncedns:
-        delete_secret(logger, ns, name, v1)
+    # Deletes run concurrently on the bounded executor, a failing namespace does not stop the others
+    await _fan_out(logger, delete_secret, syncedns, name, v1_write)
 
 
 @kopf.on.field('clustersecret.io', 'v1', 'clustersecrets', field='avoidNamespaces')
 @kopf.on.field('clustersecret.io', 'v1', 'clustersecrets', field='matchNamespace')
-def on_fields_avoid_or_match_namespace(
+async def on_fields_avoid_or_match_namespace(
     old: Optional[List[str]],
     new: List[str],
     name: str,
@@ -79,26 +167,35 @@ def on_fields_avoid_or_match_namespace(
         logger.debug('This is a new object: Ignoring.')
         return
 
-    logger.debug(f'Avoid or match namespaces changed: {old} -> {new}')
-    logger.debug(f'Updating Object body == {body}')
+    logger.debug('Avoid or match namespaces changed: %s -> %s', old, new)
+    logger.debug('Updating Object body == %s', body)
 
-    syncedns = body.get('status', {}).get('create_fn', {}).get('syncedns', [])
-
-    updated_matched = get_ns_list(logger, body, v1)
-    to_add = set(updated_matched).difference(set(syncedns))
-    to_remove = set(syncedns).difference(set(updated_matched))
+    cached_cluster_secret = csecs_cache.get_cluster_secret(uid)
+    if cached_cluster_secret is None:
+        logger.error('Received an event for an unknown ClusterSecret.')
+        syncedns = frozenset(_syncedns(body))
+    else:
+        # The precomputed set is reused as is for the difference
+        syncedns = cached_cluster_secret.synced_namespace_set
 
-    logger.debug(f'Add secret to namespaces: {to_add}, remove from: {to_remove}')
+    updated_matched = frozenset(get_ns_list(logger, body, v1, nss=get_all_namespaces()))
+    to_add = updated_matched - syncedns
+    to_remove = syncedns - updated_matched
 
-    for secret_namespace in to_add:
-        sync_secret(logger, secret_namespace, body, v1)
+    logger.debug('Add secret to namespaces: %s, remove from: %s', to_add, to_remove)
 
-    for secret_namespace in to_remove:
-        delete_secret(logger, secret_namespace, name, v1)
+    await _fan_out(logger, sync_secret, to_add, body, v1, v1_write)
+    await _fan_out(logger, delete_secret, to_remove, name, v1_write)
 
-    cached_cluster_secret = csecs_cache.get_cluster_secret(uid)
-    if cached_cluster_secret is None:
-        logger.error('Received an event for an unknown ClusterSecret.')
+    # Other handlers may have run while syncing: merge our changes into the current cached object
+    current_cluster_secret = csecs_cache.get_cluster_secret(uid)
+    if current_cluster_secret is None:
+        if cached_cluster_secret is not None:
+            logger.debug('ClusterSecret %s was deleted while syncing namespaces, skipping update', name)
+            return
+        synced = updated_matched
+    else:
+        synced = (current_cluster_secret.synced_namespace_set | to_add) - to_remove
 
     # Updating the cache
     csecs_cache.set_cluster_secret(BaseClusterSecret(
@@ -106,24 +203,23 @@ def on_fields_avoid_or_match_namespace(
         name=name,
         data=body.get('data'),
         metadata=body.get('metadata'),
-        synced_namespace=updated_matched,
+        synced_namespace=synced,
         type=body.get('type', 'Opaque'),
         match_namespace=body.get('matchNamespace'),
         avoid_namespaces=body.get('avoidNamespaces'),
     ))
 
-    # Patch synced_ns field
-    logger.debug(f'Patching clustersecret {name}')
-    patch_clustersecret_status(
-        logger=logger,
-        name=name,
-        new_status={'create_fn': {'syncedns': updated_matched}},
-        custom_objects_api=custom_objects_api,
-    )
+    # Patch synced_ns field only if the list of namespaces changed
+    if not to_add and not to_remove:
+        logger.debug('There are no changes in the list of namespaces for ClusterSecret: %s', name)
+        return
+
+    logger.debug('Patching clustersecret %s', name)
+    await _patch_status(logger, name, synced)
 
 
 @kopf.on.field('clustersecret.io', 'v1', 'clustersecrets', field='data')
-def on_field_data(
+async def on_field_data(
     old: Dict[str, str],
     new: Dict[str, str],
     body: Dict[str, Any],
@@ -137,18 +233,14 @@ def on_field_data(
         logger.debug('This is a new object: Ignoring')
         return
 
-    logger.debug(f'Data changed: {old} -> {new}')
-    logger.debug(f'Updating Object body == {body}')
-    syncedns = body.get('status', {}).get('create_fn', {}).get('syncedns', [])
+    logger.debug('Data changed: %s -> %s', old, new)
+    logger.debug('Updating Object body == %s', body)
+    syncedns = _syncedns(body)
 
     cached_cluster_secret = csecs_cache.get_cluster_secret(uid)
     if cached_cluster_secret is None:
         logger.error('Received an event for an unknown ClusterSecret.')
 
-    for ns in syncedns:
-        logger.info(f'Re Syncing secret {name} in ns {ns}')
-        sync_secret(logger, ns, body, v1)
-
     # Updating the cache
     csecs_cache.set_cluster_secret(BaseClusterSecret(
         uid=uid,
@@ -161,6 +253,23 @@ def on_field_data(
         avoid_namespaces=body.get('avoidNamespaces'),
     ))
 
+    # Re-sync is coalesced: rapid edits of the same ClusterSecret result in a single sync
+    await data_events.submit(uid, logger)
+
+
+async def resync_cluster_secrets(events: Dict[str, logging.Logger]):
+    """Re-syncs the latest cached version of each ClusterSecret into its synced namespaces
+    """
+    for uid, logger in events.items():
+        cached_cluster_secret = csecs_cache.get_cluster_secret(uid)
+        if cached_cluster_secret is None:
+            logger.debug('csec %s is not in memory anymore, skipping re-sync', uid)
+            continue
+
+        syncedns = cached_cluster_secret.synced_namespace
+        logger.info('Re Syncing secret %s in namespaces %s', cached_cluster_secret.name, syncedns)
+        await _fan_out(logger, sync_secret, syncedns, cached_cluster_secret.kubernetes_body, v1, v1_write)
+
 
 @kopf.on.resume('clustersecret.io', 'v1', 'clustersecrets')
 @kopf.on.create('clustersecret.io', 'v1', 'clustersecrets')
@@ -172,12 +281,11 @@ async def create_fn(
     **_
 ):
     # get all ns matching.
-    matchedns = get_ns_list(logger, body, v1)
+    matchedns = get_ns_list(logger, body, v1, nss=get_all_namespaces())
 
     # sync in all matched NS
-    logger.info(f'Syncing on Namespaces: {matchedns}')
-    for ns in matchedns:
-        sync_secret(logger, ns, body, v1)
+    logger.info('Syncing on Namespaces: %s', matchedns)
+    await _fan_out(logger, sync_secret, matchedns, body, v1, v1_write)
 
     # Updating the cache
     csecs_cache.set_cluster_secret(BaseClusterSecret(
@@ -202,134 +310,202 @@ async def namespace_watcher(logger: logging.Logger, reason: kopf.Reason, meta: k
     """Watch for namespace events
     """
     if reason not in ["create", "delete"]:
-        logger.error(f'Function "namespace_watcher" was called with incorrect reason: {reason}')
+        logger.error('Function "namespace_watcher" was called with incorrect reason: %s', reason)
         return
     
     ns_name = meta.name
-    logger.info(f'Namespace {"created" if reason == "create" else "deleted"}: {ns_name}. Re-syncing')
-    
-    # Fetch all namespaces once to avoid N API calls
+    logger.info('Namespace %s: %s. Re-syncing', "created" if reason == "create" else "deleted", ns_name)
+
+    if reason == "create":
+        namespaces_cache.add(ns_name)
+    else:
+        namespaces_cache.remove(ns_name)
+        namespace_phases_cache.pop(ns_name)
+
+    # Namespace bursts are coalesced: all ClusterSecrets are reconciled once per batch of events
+    await namespace_events.submit(ns_name, (reason, logger))
+
+
+# Bounds the number of ClusterSecrets reconciled concurrently after namespace events
+_RECONCILE_SEMAPHORE = asyncio.Semaphore(10)
+
+
+async def _with_reconcile_slot(coroutine: Awaitable[None]):
+    async with _RECONCILE_SEMAPHORE:
+        await coroutine
+
+
+async def reconcile_namespaces(events: Dict[str, Tuple[kopf.Reason, logging.Logger]]):
+    """Reconciles all cached ClusterSecrets against a batch of namespace events (namespace name -> reason)
+    """
+    # Any logger of the batch will do, they all come from namespace events
+    logger = next(iter(events.values()))[1]
+    created = {ns_name for ns_name, (reason, _) in events.items() if reason == "create"}
+    deleted = {ns_name for ns_name, (reason, _) in events.items() if reason == "delete"}
+
+    # Namespaces come from the cache, the API is only listed if it is not loaded yet
     try:
-        all_namespaces = [ns.metadata.name for ns in v1.list_namespace().items]
+        all_namespaces = get_all_namespaces()
     except exceptions.ApiException as e:
-        logger.error(f'Error listing namespaces: {e}')
+        logger.error('Error listing namespaces: %s', e)
+        return
+
+    results = await asyncio.gather(*[
+        _with_reconcile_slot(_reconcile_one(cached_cluster_secret, all_namespaces, created, deleted, logger))
+        for cached_cluster_secret in csecs_cache.all_cluster_secret()
+    ], return_exceptions=True)
+
+    errors = [result for result in results if isinstance(result, Exception)]
+    if errors:
+        raise errors[0]
+
+
+async def _reconcile_one(
+    cached_cluster_secret: BaseClusterSecret,
+    all_namespaces: List[str],
+    created: Set[str],
+    deleted: Set[str],
+    logger: logging.Logger,
+):
+    """Reconciles one ClusterSecret against the created and deleted namespaces
+    """
+    body = cached_cluster_secret.kubernetes_body
+    name = cached_cluster_secret.name
+    ns_list_synced = cached_cluster_secret.synced_namespace
+
+    # Use the pre-fetched namespace list
+    # Ensure that deleted namespaces will not come in new list - on moment when this event handled by kopf the namespace in kubernetes can still exists
+    ns_list_new = tuple(sorted(set(get_ns_list(logger, body, v1, nss=all_namespaces)) - deleted))
+
+    logger.debug('ClusterSecret: %s. Old matched namespaces: %s', name, ns_list_synced)
+    logger.debug('ClusterSecret: %s. New matched namespaces: %s', name, ns_list_new)
+
+    to_clone = sorted(created.intersection(ns_list_new))
+    if to_clone:
+        logger.info('Cloning secret %s into the new namespaces: %s', name, to_clone)
+        await _fan_out(logger, sync_secret, to_clone, body, v1, v1_write)
+
+    for ns_name in deleted.intersection(ns_list_synced):
+        logger.info('Secret %s removed from deleted namespace: %s', name, ns_name)
+
+    # Other handlers may have run while syncing: apply the changes to the current cached object
+    current_cluster_secret = csecs_cache.get_cluster_secret(cached_cluster_secret.uid)
+    if current_cluster_secret is None:
+        logger.debug('ClusterSecret %s was deleted while reconciling namespaces, skipping update', name)
         return
+    synced = tuple(sorted((current_cluster_secret.synced_namespace_set | set(to_clone)) - deleted))
 
-    for cached_cluster_secret in csecs_cache.all_cluster_secret():
-        body = cached_cluster_secret.kubernetes_body
-        name = cached_cluster_secret.name
-        ns_list_synced = cached_cluster_secret.synced_namespace
-        
-        # Use the pre-fetched namespace list
-        ns_list_new = get_ns_list(logger, body, v1, nss=all_namespaces)
-        ns_list_changed = False
-
-        logger.debug(f'ClusterSecret: {name}. Old matched namespaces: {ns_list_synced}')
-        logger.debug(f'ClusterSecret: {name}. New matched namespaces: {ns_list_new}')
-        
-        if reason == "create" and ns_name in ns_list_new:
-            logger.info(f'Cloning secret {name} into the new namespace: {ns_name}')
-            sync_secret(
-                logger=logger,
-                namespace=ns_name,
-                body=body,
-                v1=v1,
-            )
-            ns_list_changed = True
-        
-        if reason == "delete" and ns_name in ns_list_synced:
-            logger.info(f'Secret {name} removed from deleted namespace: {ns_name}')
-            # Ensure that deleted namespace will not come in new list - on moment when this event handled by kopf the namespace in kubernetes can still exists
-            if ns_name in ns_list_new:
-                ns_list_new.remove(ns_name)
-            ns_list_changed = True
-
-        # Update ClusterSecret only if there are changes in list of his namespaces
-        if ns_list_changed:
-            # Update in-memory cache
-            cached_cluster_secret.synced_namespace = ns_list_new
-            csecs_cache.set_cluster_secret(cached_cluster_secret)
-
-            # Update the list of synced namespaces in kubernetes object
-            logger.debug(f'Patching ClusterSecret: {name}')
-            patch_clustersecret_status(
-                logger=logger,
-                name=name,
-                new_status={'create_fn': {'syncedns': ns_list_new}},
-                custom_objects_api=custom_objects_api,
-            )
-        else:
-            logger.debug(f'There are no changes in the list of namespaces for ClusterSecret: {name}')
-
-@kopf.on.event('', 'v1', 'secrets')
-def on_secret_event(event, logger: logging.Logger, **_):
-    """Watch for all secret events
+    # Update ClusterSecret only if there are changes in list of his namespaces (both are sorted tuples)
+    if synced != current_cluster_secret.synced_namespace:
+        # Update in-memory cache with a new object, cached ones are shared with readers and never modified
+        csecs_cache.set_cluster_secret(dataclasses.replace(current_cluster_secret, synced_namespace=synced))
+
+        # Update the list of synced namespaces in kubernetes object
+        logger.debug('Patching ClusterSecret: %s', name)
+        await _patch_status(logger, name, synced)
+    else:
+        logger.debug('There are no changes in the list of namespaces for ClusterSecret: %s', name)
+
+
+namespace_events = Debouncer(reconcile_namespaces, delay=get_event_debounce())
+data_events = Debouncer(resync_cluster_secrets, delay=get_event_debounce())
+
+
+def _handle_source_upsert(
+    name: str,
+    namespace: str,
+    source_for_csecs: List[BaseClusterSecret],
+    logger: logging.Logger,
+):
+    """Source secret created or updated: re-sync the ClusterSecrets reading from it
+    """
+    for csec in source_for_csecs:
+        logger.info('Source secret %s in namespace %s changed. Re-syncing ClusterSecret %s', name, namespace, csec.name)
+        body = csec.kubernetes_body
+        for ns in csec.synced_namespace:
+            logger.debug('Re-syncing ClusterSecret %s to namespace %s', csec.name, ns)
+            sync_secret(logger, ns, body, v1, v1_write)
+
+
+def _handle_source_delete(
+    name: str,
+    namespace: str,
+    source_for_csecs: List[BaseClusterSecret],
+    logger: logging.Logger,
+):
+    """Source secret deleted: the ClusterSecrets reading from it can not be synced anymore
+    """
+    for csec in source_for_csecs:
+        logger.warning('Source secret %s in namespace %s was deleted! ClusterSecret %s is now stale.', name, namespace, csec.name)
+
+
+# Source secret event type -> handler, other event types are ignored
+_SOURCE_EVENT_HANDLERS = {
+    'ADDED': _handle_source_upsert,
+    'MODIFIED': _handle_source_upsert,
+    'DELETED': _handle_source_delete,
+}
+
+
+def is_source_secret(name: str, namespace: str, **_) -> bool:
+    """Whether the secret is the valueFrom source of any cached ClusterSecret
+    """
+    return bool(csecs_cache.get_by_source(name, namespace))
+
+
+@kopf.on.event('', 'v1', 'secrets', annotations={CREATE_BY_ANNOTATION: CREATE_BY_AUTHOR})
+def on_managed_secret_event(event, logger: logging.Logger, **_):
+    """Watch for events of the secrets created by ClusterSecret, restores them when deleted (self-healing)
     """
-    event_type = event.get('type')
     obj = event.get('object')
-    if not obj or event_type not in ['ADDED', 'MODIFIED', 'DELETED']:
+    if not obj or event.get('type') != 'DELETED':
         return
-        
+
     metadata = obj.get('metadata', {})
     name = metadata.get('name')
     namespace = metadata.get('namespace')
-    labels = metadata.get('labels', {})
-    annotations = metadata.get('annotations', {})
 
-    if is_noise_secret(name, labels):
+    # Self-healing: restore if the ClusterSecret still exists and namespace is not terminating
+    cached_cluster_secret = csecs_cache.get_by_name(name)
+    if cached_cluster_secret is None or namespace not in cached_cluster_secret.synced_namespace_set:
         return
 
-    # Check if this secret is relevant to any ClusterSecret
-    # A secret is relevant if:
-    # 1. It is managed by us (has our annotation)
-    # 2. It is a source secret (matches name/namespace of any valueFrom)
-    
-    is_managed = annotations.get(CREATE_BY_ANNOTATION) == CREATE_BY_AUTHOR
-    
-    # Pre-calculate if it's a source secret to avoid repeated loops
-    source_for_csecs = []
-    for cached_cluster_secret in csecs_cache.all_cluster_secret():
-        value_from = cached_cluster_secret.data.get('valueFrom', {})
-        ref = value_from.get('secretKeyRef', {})
-        if ref.get('name') == name and ref.get('namespace') == namespace:
-            source_for_csecs.append(cached_cluster_secret)
-
-    if not is_managed and not source_for_csecs:
+    # Check if namespace is terminating
+    try:
+        phase = get_namespace_phase(namespace)
+        if phase is None:
+            return
+        if phase == 'Terminating':
+            logger.info('Namespace %s is terminating. Skipping self-healing for secret %s.', namespace, name)
+            return
+    except exceptions.ApiException as e:
+        logger.error('Error checking namespace status: %s', e)
+
+    logger.info('Managed secret %s deleted from namespace %s. Re-syncing to restore.', name, namespace)
+    body = cached_cluster_secret.kubernetes_body
+    sync_secret(logger, namespace, body, v1, v1_write)
+
+
+@kopf.on.event('', 'v1', 'secrets', when=is_source_secret)
+def on_source_secret_event(event, logger: logging.Logger, **_):
+    """Watch for events of the secrets used as valueFrom source by ClusterSecrets
+    """
+    handler = _SOURCE_EVENT_HANDLERS.get(event.get('type'))
+    obj = event.get('object')
+    if handler is None or not obj:
         return
 
-    # 1. Handle Secret Creation or Update (Source Secret tracking)
-    if event_type in ['ADDED', 'MODIFIED']:
-        for csec in source_for_csecs:
-            logger.info(f'Source secret {name} in namespace {namespace} changed. Re-syncing ClusterSecret {csec.name}')
-            body = csec.kubernetes_body
-            for ns in csec.synced_namespace:
-                logger.debug(f'Re-syncing ClusterSecret {csec.name} to namespace {ns}')
-                sync_secret(logger, ns, body, v1)
-
-    # 2. Handle Secret Deletion
-    if event_type == 'DELETED':
-        if is_managed:
-            # Self-healing: restore if the ClusterSecret still exists and namespace is not terminating
-            for cached_cluster_secret in csecs_cache.all_cluster_secret():
-                if cached_cluster_secret.name == name and namespace in cached_cluster_secret.synced_namespace:
-                    # Check if namespace is terminating
-                    try:
-                        ns = v1.read_namespace(name=namespace)
-                        if ns.status.phase == 'Terminating':
-                            logger.info(f'Namespace {namespace} is terminating. Skipping self-healing for secret {name}.')
-                            return
-                    except exceptions.ApiException as e:
-                        if e.status == 404:
-                            return
-                        logger.error(f'Error checking namespace status: {e}')
-
-                    logger.info(f'Managed secret {name} deleted from namespace {namespace}. Re-syncing to restore.')
-                    body = cached_cluster_secret.kubernetes_body
-                    sync_secret(logger, namespace, body, v1)
-                    return
-        
-        for csec in source_for_csecs:
-            logger.warning(f'Source secret {name} in namespace {namespace} was deleted! ClusterSecret {csec.name} is now stale.')
+    metadata = obj.get('metadata', {})
+    name = metadata.get('name')
+    namespace = metadata.get('namespace')
+
+    # The ClusterSecret may have changed since the event was filtered
+    source_for_csecs = csecs_cache.get_by_source(name, namespace)
+    if not source_for_csecs:
+        return
+
+    handler(name, namespace, source_for_csecs, logger)
+
 
 @kopf.on.startup()
 async def startup_fn(logger: logging.Logger, **_):
@@ -342,6 +518,10 @@ async def startup_fn(logger: logging.Logger, **_):
     """,
     )
 
+    # Workers coalescing bursts of namespace and data events
+    namespace_events.start()
+    data_events.start()
+
     cluster_secrets = get_custom_objects_by_kind(
         group='clustersecret.io',
         version='v1',
@@ -349,18 +529,20 @@ async def startup_fn(logger: logging.Logger, **_):
         custom_objects_api=custom_objects_api,
     )
 
-    logger.info(f'Found {len(cluster_secrets)} existing cluster secrets.')
-    for item in cluster_secrets:
-        metadata = item.get('metadata')
-        csecs_cache.set_cluster_secret(
-            BaseClusterSecret(
-                uid=metadata.get('uid'),
-                name=metadata.get('name'),
-                data=item.get('data'),
-                metadata=metadata,
-                synced_namespace=item.get('status', {}).get('create_fn', {}).get('syncedns', []),
-                type=item.get('type', 'Opaque'),
-                match_namespace=item.get('matchNamespace'),
-                avoid_namespaces=item.get('avoidNamespaces'),
-            )
-        )
+    namespaces_cache.load(ns.metadata.name for ns in v1.list_namespace().items)
+    logger.info('Found %s existing namespaces.', len(namespaces_cache.names()))
+
+    logger.info('Found %s existing cluster secrets.', len(cluster_secrets))
+    csecs_cache.bulk_load([
+        cluster_secret_adapter.validate_python(dict(
+            uid=item['metadata'].get('uid'),
+            name=item['metadata'].get('name'),
+            data=item.get('data'),
+            metadata=item['metadata'],
+            synced_namespace=_syncedns(item),
+            type=item.get('type', 'Opaque'),
+            match_namespace=item.get('matchNamespace'),
+            avoid_namespaces=item.get('avoidNamespaces'),
+        ))
+        for item in cluster_secrets
+    ])
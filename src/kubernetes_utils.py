@@ -8,7 +8,7 @@ from kubernetes.client import CoreV1Api, CustomObjectsApi, exceptions, V1ObjectM
 
 from os_utils import get_blocked_labels, get_replace_existing, get_version
 from consts import CREATE_BY_ANNOTATION, LAST_SYNC_ANNOTATION, VERSION_ANNOTATION, BLOCKED_ANNOTATIONS, \
-    CREATE_BY_AUTHOR, CLUSTER_SECRET_LABEL
+    CREATE_BY_AUTHOR, CLUSTER_SECRET_LABEL, FIELD_MANAGER
 
 
 def patch_clustersecret_status(
@@ -18,30 +18,21 @@ def patch_clustersecret_status(
     custom_objects_api: CustomObjectsApi,
 ):
     """Patch the status of a given clustersecret object
+    Only the status is sent as a merge patch without resourceVersion, so no read of the object is
+    needed and the patch is last-write-wins.
     """
     group = 'clustersecret.io'
     version = 'v1'
     plural = 'clustersecrets'
 
-    # Retrieve the clustersecret object
-    clustersecret = custom_objects_api.get_cluster_custom_object(
-        group=group,
-        version=version,
-        plural=plural,
-        name=name,
-    )
-
-    # Update the status field
-    clustersecret['status'] = new_status
-    logger.debug(f'Updated clustersecret manifest: {clustersecret}')
-
-    # Perform a patch operation to update the custom resource
+    logger.debug(f'Patching clustersecret {name} status: {new_status}')
     return custom_objects_api.patch_cluster_custom_object(
         group=group,
         version=version,
         plural=plural,
         name=name,
-        body=clustersecret,
+        body={'status': new_status},
+        field_manager=FIELD_MANAGER,
     )
 
 
@@ -169,9 +160,14 @@ def sync_secret(
         namespace: str,
         body: Dict[str, Any],
         v1: CoreV1Api,
+        v1_write: Optional[CoreV1Api] = None,
 ):
     """Creates a given secret on a given namespace
+    Reads go through 'v1', creates and replaces through 'v1_write' (defaults to 'v1').
     """
+    if v1_write is None:
+        v1_write = v1
+
     if 'metadata' not in body:
         raise kopf.TemporaryError('Metadata is required.')
 
@@ -243,7 +239,7 @@ def sync_secret(
         # If nothing returned, the secret does not exist, creating it then
         if metadata is None:
             logger.info(f'Creating new secret {sec_name} in namespace {namespace}.')
-            logger.debug(f'response is {v1.create_namespaced_secret(namespace, body)}')
+            logger.debug(f'response is {v1_write.create_namespaced_secret(namespace, body)}')
             return
 
         if metadata.annotations is None or metadata.annotations.get(CREATE_BY_ANNOTATION) is None:
@@ -255,7 +251,7 @@ def sync_secret(
                 return
 
         logger.info(f'Replacing secret {sec_name} in namespace {namespace}.')
-        v1.replace_namespaced_secret(
+        v1_write.replace_namespaced_secret(
             name=sec_name,
             namespace=namespace,
             body=body,
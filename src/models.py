@@ -1,27 +1,45 @@
-from typing import List, Dict, Any, Optional
+from dataclasses import dataclass, field
+from typing import FrozenSet, List, Dict, Any, Optional, Tuple
 
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import TypeAdapter
 
 
-class BaseClusterSecret(BaseModel):
-    model_config = ConfigDict(populate_by_name=True)
-
+@dataclass(slots=True)
+class BaseClusterSecret:
     uid: str
     name: str
     data: Dict[str, Any]
     metadata: Dict[str, Any]
-    synced_namespace: List[str]
+    synced_namespace: Tuple[str, ...]
     type: str = "Opaque"
-    match_namespace: Optional[List[str]] = Field(None, alias="matchNamespace")
-    avoid_namespaces: Optional[List[str]] = Field(None, alias="avoidNamespaces")
+    match_namespace: Optional[List[str]] = None
+    avoid_namespaces: Optional[List[str]] = None
+    # Set form of synced_namespace, computed once for set operations and membership tests
+    synced_namespace_set: FrozenSet[str] = field(default=frozenset(), init=False, repr=False, compare=False)
+    _body_cache: Optional[Dict[str, Any]] = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        # Canonical form: sorted tuple without duplicates, so two lists of namespaces compare with ==
+        self.synced_namespace_set = frozenset(self.synced_namespace)
+        self.synced_namespace = tuple(sorted(self.synced_namespace_set))
 
     @property
     def kubernetes_body(self) -> Dict[str, Any]:
-        """Returns a dictionary formatted for sync_secret and Kubernetes API"""
-        return {
-            'metadata': self.metadata,
-            'data': self.data,
-            'type': self.type,
-            'matchNamespace': self.match_namespace,
-            'avoidNamespaces': self.avoid_namespaces,
-        }
+        """Returns a dictionary formatted for sync_secret and Kubernetes API, built once and cached"""
+        if self._body_cache is None:
+            self._body_cache = {
+                'metadata': self.metadata,
+                'data': self.data,
+                'type': self.type,
+                'matchNamespace': self.match_namespace,
+                'avoidNamespaces': self.avoid_namespaces,
+            }
+        return self._body_cache
+
+    def invalidate_kubernetes_body(self):
+        """Drops the cached kubernetes_body, it is rebuilt on next access"""
+        self._body_cache = None
+
+
+# Validates ClusterSecrets once when they are loaded from the API, the cache only holds plain dataclasses
+cluster_secret_adapter = TypeAdapter(BaseClusterSecret)
@@ -32,3 +32,11 @@ def in_cluster() -> bool:
     Whether we are running in cluster (on the pod)  or outside (debug mode.)
     """
     return os.getenv('KUBERNETES_SERVICE_HOST', None) is not None
+
+
+@cache
+def get_event_debounce() -> float:
+    """
+    Window (in seconds) used to coalesce bursts of namespace and data events.
+    """
+    return float(os.getenv('EVENT_DEBOUNCE_SECONDS', '0.25'))
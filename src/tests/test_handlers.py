@@ -6,7 +6,9 @@ import unittest
 from kubernetes.client import V1ObjectMeta, V1Secret, ApiException
 from unittest.mock import ANY, Mock, patch
 
-from handlers import create_fn, custom_objects_api, csecs_cache, namespace_watcher, on_field_data, startup_fn, on_secret_event
+from handlers import create_fn, custom_objects_api, csecs_cache, namespace_watcher, on_field_data, startup_fn, \
+    on_fields_avoid_or_match_namespace, namespaces_cache, on_delete, namespace_phases_cache, on_managed_secret_event, \
+    on_source_secret_event, is_source_secret
 from kubernetes_utils import create_secret_metadata
 from models import BaseClusterSecret
 
@@ -17,6 +19,8 @@ class TestClusterSecretHandler(unittest.TestCase):
         self.logger = logging.getLogger(__name__)
         for cluster_secret in csecs_cache.all_cluster_secret():
             csecs_cache.remove_cluster_secret(cluster_secret.uid)
+        namespaces_cache.clear()
+        namespace_phases_cache.clear()
 
     def test_on_field_data_cache(self):
         """New data should be written into the cache.
@@ -36,15 +40,17 @@ class TestClusterSecretHandler(unittest.TestCase):
         # New data coming into the callback.
         new_body = {"metadata": {"name": "mysecret", "uid": "mysecretuid"}, "data": {"key": "newvalue"}}
 
-        on_field_data(
-            old={"key": "oldvalue"},
-            new={"key": "newvalue"},
-            body=new_body,
-            meta=kopf.Meta({"metadata": {"name": "mysecret"}}),
-            name="mysecret",
-            uid="mysecretuid",
-            logger=self.logger,
-            reason="update",
+        asyncio.run(
+            on_field_data(
+                old={"key": "oldvalue"},
+                new={"key": "newvalue"},
+                body=new_body,
+                meta=kopf.Meta({"metadata": {"name": "mysecret"}}),
+                name="mysecret",
+                uid="mysecretuid",
+                logger=self.logger,
+                reason="update",
+            )
         )
 
         # New data should be in the cache.
@@ -92,16 +98,19 @@ class TestClusterSecretHandler(unittest.TestCase):
             "status": {"create_fn": {"syncedns": ["myns"]}},
         }
 
-        with patch("handlers.v1", mock_v1):
-            on_field_data(
-                old={"key": "oldvalue"},
-                new={"key": "newvalue"},
-                body=new_body,
-                meta=kopf.Meta({"metadata": {"name": "mysecret"}}),
-                name="mysecret",
-                uid="mysecretuid",
-                logger=self.logger,
-                reason="update",
+        with patch("handlers.v1", mock_v1), \
+             patch("handlers.v1_write", mock_v1):
+            asyncio.run(
+                on_field_data(
+                    old={"key": "oldvalue"},
+                    new={"key": "newvalue"},
+                    body=new_body,
+                    meta=kopf.Meta({"metadata": {"name": "mysecret"}}),
+                    name="mysecret",
+                    uid="mysecretuid",
+                    logger=self.logger,
+                    reason="update",
+                )
             )
 
         # Namespaced secret should be updated.
@@ -138,6 +147,7 @@ class TestClusterSecretHandler(unittest.TestCase):
         mock_v1.list_namespace.return_value.items = predefined_nss
 
         with patch("handlers.v1", mock_v1), \
+             patch("handlers.v1_write", mock_v1), \
              patch("handlers.sync_secret"):
             asyncio.run(
                 create_fn(
@@ -151,9 +161,220 @@ class TestClusterSecretHandler(unittest.TestCase):
         # The secrets should be in all namespaces of the cache.
         self.assertEqual(
             csecs_cache.get_cluster_secret("mysecretuid").synced_namespace,
-            ["default", "myns"],
+            ("default", "myns"),
+        )
+
+    def test_on_delete(self):
+        """Must try to delete the secret from all synced namespaces, even if one of them fails, then re-raise.
+        """
+
+        delete_secret_mock = Mock(side_effect=[Exception("boom"), None, None])
+
+        csec = BaseClusterSecret(
+            uid="mysecretuid",
+            name="mysecret",
+            metadata={"name": "mysecret", "uid": "mysecretuid"},
+            data={"key": "value"},
+            synced_namespace=["ns1", "ns2", "ns3"],
+        )
+        csecs_cache.set_cluster_secret(csec)
+
+        body = {
+            "metadata": {"name": "mysecret", "uid": "mysecretuid"},
+            "data": {"key": "value"},
+            "status": {"create_fn": {"syncedns": ["ns1", "ns2", "ns3"]}},
+        }
+
+        with patch("handlers.delete_secret", delete_secret_mock), \
+                self.assertRaisesRegex(Exception, "boom"):
+            asyncio.run(
+                on_delete(
+                    body=body,
+                    uid="mysecretuid",
+                    name="mysecret",
+                    logger=self.logger,
+                )
+            )
+
+        self.assertEqual(delete_secret_mock.call_count, 3)
+        self.assertIsNone(csecs_cache.get_cluster_secret("mysecretuid"))
+
+    def test_on_fields_avoid_or_match_namespace(self):
+        """Must sync into newly matched namespaces and delete from no longer matched ones.
+        """
+
+        mock_v1 = Mock()
+        sync_secret_mock = Mock()
+        delete_secret_mock = Mock()
+        patch_clustersecret_status = Mock()
+
+        predefined_nss = [Mock(metadata=V1ObjectMeta(name=ns)) for ns in ["default", "myns", "otherns"]]
+        mock_v1.list_namespace.return_value.items = predefined_nss
+
+        body = {
+            "metadata": {"name": "mysecret", "uid": "mysecretuid"},
+            "data": {"key": "value"},
+            "matchNamespace": ["myns", "otherns"],
+            "status": {"create_fn": {"syncedns": ["default", "myns"]}},
+        }
+
+        with patch("handlers.v1", mock_v1), \
+             patch("handlers.v1_write", mock_v1), \
+             patch("handlers.sync_secret", sync_secret_mock), \
+             patch("handlers.delete_secret", delete_secret_mock), \
+             patch("handlers.patch_clustersecret_status", patch_clustersecret_status):
+            asyncio.run(
+                on_fields_avoid_or_match_namespace(
+                    old=None,
+                    new=["myns", "otherns"],
+                    name="mysecret",
+                    body=body,
+                    uid="mysecretuid",
+                    logger=self.logger,
+                    reason="update",
+                )
+            )
+
+        sync_secret_mock.assert_called_once_with(self.logger, "otherns", body, mock_v1, mock_v1)
+        delete_secret_mock.assert_called_once_with(self.logger, "default", "mysecret", mock_v1)
+        self.assertCountEqual(
+            csecs_cache.get_cluster_secret("mysecretuid").synced_namespace,
+            ["myns", "otherns"],
+        )
+
+    def test_on_fields_avoid_or_match_namespace_unchanged(self):
+        """Must not patch the status when the matched namespaces did not change.
+        """
+
+        mock_v1 = Mock()
+        patch_clustersecret_status = Mock()
+
+        predefined_nss = [Mock(metadata=V1ObjectMeta(name=ns)) for ns in ["default", "myns"]]
+        mock_v1.list_namespace.return_value.items = predefined_nss
+
+        body = {
+            "metadata": {"name": "mysecret", "uid": "mysecretuid"},
+            "data": {"key": "value"},
+            "matchNamespace": ["my.*"],
+            "status": {"create_fn": {"syncedns": ["myns"]}},
+        }
+
+        with patch("handlers.v1", mock_v1), \
+             patch("handlers.v1_write", mock_v1), \
+             patch("handlers.patch_clustersecret_status", patch_clustersecret_status):
+            asyncio.run(
+                on_fields_avoid_or_match_namespace(
+                    old=["myns"],
+                    new=["my.*"],
+                    name="mysecret",
+                    body=body,
+                    uid="mysecretuid",
+                    logger=self.logger,
+                    reason="update",
+                )
+            )
+
+        patch_clustersecret_status.assert_not_called()
+        self.assertEqual(
+            csecs_cache.get_cluster_secret("mysecretuid").match_namespace,
+            ["my.*"],
         )
 
+    def test_on_fields_avoid_or_match_namespace_concurrent_sync(self):
+        """Namespaces synced by other handlers while the patterns change must be kept.
+        """
+
+        mock_v1 = Mock()
+        patch_clustersecret_status = Mock()
+
+        predefined_nss = [Mock(metadata=V1ObjectMeta(name=ns)) for ns in ["a", "default", "old"]]
+        mock_v1.list_namespace.return_value.items = predefined_nss
+
+        csecs_cache.set_cluster_secret(BaseClusterSecret(
+            uid="mysecretuid",
+            name="mysecret",
+            metadata={"name": "mysecret", "uid": "mysecretuid"},
+            data={"key": "value"},
+            synced_namespace=["default", "old"],
+            match_namespace=["default", "old", "newns"],
+        ))
+
+        body = {
+            "metadata": {"name": "mysecret", "uid": "mysecretuid"},
+            "data": {"key": "value"},
+            "matchNamespace": ["a", "default", "newns"],
+        }
+
+        def sync_secret(logger, namespace, *args):
+            # namespace_watcher syncs the newly created namespace meanwhile
+            current = csecs_cache.get_cluster_secret("mysecretuid")
+            csecs_cache.set_cluster_secret(BaseClusterSecret(
+                uid=current.uid,
+                name=current.name,
+                metadata=current.metadata,
+                data=current.data,
+                synced_namespace=current.synced_namespace + ("newns",),
+                match_namespace=current.match_namespace,
+            ))
+
+        with patch("handlers.v1", mock_v1), \
+             patch("handlers.v1_write", mock_v1), \
+             patch("handlers.sync_secret", sync_secret), \
+             patch("handlers.delete_secret"), \
+             patch("handlers.patch_clustersecret_status", patch_clustersecret_status):
+            asyncio.run(
+                on_fields_avoid_or_match_namespace(
+                    old=["default", "old", "newns"],
+                    new=["a", "default", "newns"],
+                    name="mysecret",
+                    body=body,
+                    uid="mysecretuid",
+                    logger=self.logger,
+                    reason="update",
+                )
+            )
+
+        self.assertEqual(
+            csecs_cache.get_cluster_secret("mysecretuid").synced_namespace,
+            ("a", "default", "newns"),
+        )
+        patch_clustersecret_status.assert_called_once_with(
+            logger=self.logger,
+            name="mysecret",
+            new_status={'create_fn': {'syncedns': ["a", "default", "newns"]}},
+            custom_objects_api=custom_objects_api,
+        )
+
+    def test_create_fn_overlapping_patterns(self):
+        """A namespace matched by several patterns must be synced once.
+        """
+
+        mock_v1 = Mock()
+        sync_secret_mock = Mock()
+
+        body = {
+            "metadata": {"name": "mysecret", "uid": "mysecretuid"},
+            "data": {"key": "value"},
+            "matchNamespace": ["my.*", "myns"],
+        }
+
+        predefined_nss = [Mock(metadata=V1ObjectMeta(name=ns)) for ns in ["default", "myns"]]
+        mock_v1.list_namespace.return_value.items = predefined_nss
+
+        with patch("handlers.v1", mock_v1), \
+             patch("handlers.v1_write", mock_v1), \
+             patch("handlers.sync_secret", sync_secret_mock):
+            asyncio.run(
+                create_fn(
+                    logger=self.logger,
+                    uid="mysecretuid",
+                    name="mysecret",
+                    body=body,
+                )
+            )
+
+        sync_secret_mock.assert_called_once_with(self.logger, "myns", body, mock_v1, mock_v1)
+
     def test_ns_create(self):
         """A new namespace must get the cluster secrets.
         """
@@ -179,6 +400,7 @@ class TestClusterSecretHandler(unittest.TestCase):
         csecs_cache.set_cluster_secret(csec)
 
         with patch("handlers.v1", mock_v1), \
+             patch("handlers.v1_write", mock_v1), \
              patch("handlers.patch_clustersecret_status", patch_clustersecret_status):
             asyncio.run(
                 namespace_watcher(
@@ -235,6 +457,7 @@ class TestClusterSecretHandler(unittest.TestCase):
         csecs_cache.set_cluster_secret(csec)
 
         with patch("handlers.v1", mock_v1), \
+             patch("handlers.v1_write", mock_v1), \
              patch("handlers.patch_clustersecret_status", patch_clustersecret_status):
             asyncio.run(
                 namespace_watcher(
@@ -258,6 +481,252 @@ class TestClusterSecretHandler(unittest.TestCase):
             ["default"],
         )
 
+    def test_ns_delete_unmatched(self):
+        """Deleting a namespace the cluster secret is not synced to must not patch its status.
+        """
+
+        mock_v1 = Mock()
+
+        predefined_nss = [Mock(metadata=V1ObjectMeta(name=ns)) for ns in ["default", "otherns"]]
+        mock_v1.list_namespace.return_value.items = predefined_nss
+
+        patch_clustersecret_status = Mock()
+
+        csec = BaseClusterSecret(
+            uid="mysecretuid",
+            name="mysecret",
+            metadata={"name": "mysecret"},
+            data={"key": "mydata"},
+            synced_namespace=["default"],
+            match_namespace=["default"],
+        )
+
+        csecs_cache.set_cluster_secret(csec)
+
+        with patch("handlers.v1", mock_v1), \
+             patch("handlers.patch_clustersecret_status", patch_clustersecret_status):
+            asyncio.run(
+                namespace_watcher(
+                    logger=self.logger,
+                    meta=kopf.Meta({"metadata": {"name": "otherns"}}),
+                    reason="delete",
+                )
+            )
+
+        patch_clustersecret_status.assert_not_called()
+
+    def test_ns_create_concurrent_delete(self):
+        """A ClusterSecret deleted while its namespaces are reconciled must not come back into the cache.
+        """
+
+        mock_v1 = Mock()
+
+        predefined_nss = [Mock(metadata=V1ObjectMeta(name=ns)) for ns in ["default", "myns"]]
+        mock_v1.list_namespace.return_value.items = predefined_nss
+
+        patch_clustersecret_status = Mock()
+
+        csec = BaseClusterSecret(
+            uid="mysecretuid",
+            name="mysecret",
+            metadata={"name": "mysecret"},
+            data={"key": "mydata"},
+            synced_namespace=["default"],
+        )
+
+        csecs_cache.set_cluster_secret(csec)
+
+        def slow_sync_secret(*args):
+            # The ClusterSecret is deleted while the new namespace is synced
+            csecs_cache.remove_cluster_secret("mysecretuid")
+
+        with patch("handlers.v1", mock_v1), \
+             patch("handlers.sync_secret", slow_sync_secret), \
+             patch("handlers.patch_clustersecret_status", patch_clustersecret_status):
+            asyncio.run(
+                namespace_watcher(
+                    logger=self.logger,
+                    meta=kopf.Meta({"metadata": {"name": "myns"}}),
+                    reason="create",
+                )
+            )
+
+        self.assertIsNone(csecs_cache.get_cluster_secret("mysecretuid"))
+        self.assertIsNone(csecs_cache.get_by_name("mysecret"))
+        patch_clustersecret_status.assert_not_called()
+
+        # The cached object itself must not be modified
+        self.assertEqual(csec.synced_namespace, ("default",))
+
+    def test_ns_create_concurrent_update(self):
+        """A ClusterSecret updated while reconciled concurrently with others must keep its update and the new namespace.
+        """
+
+        mock_v1 = Mock()
+
+        predefined_nss = [Mock(metadata=V1ObjectMeta(name=ns)) for ns in ["default", "myns"]]
+        mock_v1.list_namespace.return_value.items = predefined_nss
+
+        for index in range(2):
+            csecs_cache.set_cluster_secret(BaseClusterSecret(
+                uid=f"mysecretuid-{index}",
+                name=f"mysecret-{index}",
+                metadata={"name": f"mysecret-{index}"},
+                data={"key": "mydata"},
+                synced_namespace=["default"],
+            ))
+
+        updated = BaseClusterSecret(
+            uid="mysecretuid-0",
+            name="mysecret-0",
+            metadata={"name": "mysecret-0"},
+            data={"key": "newdata"},
+            synced_namespace=["default"],
+        )
+
+        def sync_secret(logger, namespace, body, *args):
+            # mysecret-0 data is updated while the new namespace is synced
+            if body["metadata"]["name"] == "mysecret-0":
+                csecs_cache.set_cluster_secret(updated)
+
+        with patch("handlers.v1", mock_v1), \
+             patch("handlers.sync_secret", sync_secret), \
+             patch("handlers.patch_clustersecret_status"):
+            asyncio.run(
+                namespace_watcher(
+                    logger=self.logger,
+                    meta=kopf.Meta({"metadata": {"name": "myns"}}),
+                    reason="create",
+                )
+            )
+
+        self.assertEqual(
+            csecs_cache.get_cluster_secret("mysecretuid-0").synced_namespace,
+            ("default", "myns"),
+        )
+        self.assertEqual(csecs_cache.get_cluster_secret("mysecretuid-0").data, {"key": "newdata"})
+        self.assertEqual(
+            csecs_cache.get_cluster_secret("mysecretuid-1").synced_namespace,
+            ("default", "myns"),
+        )
+
+    def test_ns_create_many_cluster_secrets(self):
+        """A new namespace must get all matching cluster secrets.
+        """
+
+        mock_v1 = Mock()
+
+        predefined_nss = [Mock(metadata=V1ObjectMeta(name=ns)) for ns in ["default", "myns"]]
+        mock_v1.list_namespace.return_value.items = predefined_nss
+
+        patch_clustersecret_status = Mock()
+
+        for index in range(3):
+            csecs_cache.set_cluster_secret(BaseClusterSecret(
+                uid=f"mysecretuid-{index}",
+                name=f"mysecret-{index}",
+                metadata={"name": f"mysecret-{index}"},
+                data={"key": "mydata"},
+                synced_namespace=["default"],
+            ))
+
+        with patch("handlers.v1", mock_v1), \
+             patch("handlers.v1_write", mock_v1), \
+             patch("handlers.patch_clustersecret_status", patch_clustersecret_status):
+            asyncio.run(
+                namespace_watcher(
+                    logger=self.logger,
+                    meta=kopf.Meta({"metadata": {"name": "myns"}}),
+                    reason="create",
+                )
+            )
+
+        self.assertEqual(mock_v1.replace_namespaced_secret.call_count, 3)
+        self.assertEqual(patch_clustersecret_status.call_count, 3)
+        for index in range(3):
+            self.assertCountEqual(
+                csecs_cache.get_cluster_secret(f"mysecretuid-{index}").synced_namespace,
+                ["default", "myns"],
+            )
+
+    def test_ns_create_burst(self):
+        """A burst of namespace events must be reconciled with a single namespace listing.
+        """
+
+        mock_v1 = Mock()
+
+        predefined_nss = [Mock(metadata=V1ObjectMeta(name=ns)) for ns in ["default", "ns1", "ns2"]]
+        mock_v1.list_namespace.return_value.items = predefined_nss
+
+        patch_clustersecret_status = Mock()
+
+        csec = BaseClusterSecret(
+            uid="mysecretuid",
+            name="mysecret",
+            metadata={"name": "mysecret"},
+            data={"key": "mydata"},
+            synced_namespace=["default"],
+        )
+
+        csecs_cache.set_cluster_secret(csec)
+
+        async def burst():
+            await asyncio.gather(*[
+                namespace_watcher(
+                    logger=self.logger,
+                    meta=kopf.Meta({"metadata": {"name": ns}}),
+                    reason="create",
+                )
+                for ns in ["ns1", "ns2"]
+            ])
+
+        with patch("handlers.v1", mock_v1), \
+             patch("handlers.v1_write", mock_v1), \
+             patch("handlers.patch_clustersecret_status", patch_clustersecret_status):
+            asyncio.run(burst())
+
+        mock_v1.list_namespace.assert_called_once()
+        patch_clustersecret_status.assert_called_once()
+        self.assertCountEqual(
+            csecs_cache.get_cluster_secret("mysecretuid").synced_namespace,
+            ["default", "ns1", "ns2"],
+        )
+
+    def test_ns_create_cached_namespaces(self):
+        """Namespace events must update the namespace cache without listing namespaces.
+        """
+
+        mock_v1 = Mock()
+        namespaces_cache.load(["default"])
+
+        csec = BaseClusterSecret(
+            uid="mysecretuid",
+            name="mysecret",
+            metadata={"name": "mysecret"},
+            data={"key": "mydata"},
+            synced_namespace=["default"],
+        )
+
+        csecs_cache.set_cluster_secret(csec)
+
+        with patch("handlers.v1", mock_v1), \
+             patch("handlers.v1_write", mock_v1), \
+             patch("handlers.patch_clustersecret_status"):
+            asyncio.run(
+                namespace_watcher(
+                    logger=self.logger,
+                    meta=kopf.Meta({"metadata": {"name": "myns"}}),
+                    reason="create",
+                )
+            )
+
+        mock_v1.list_namespace.assert_not_called()
+        self.assertEqual(namespaces_cache.names(), ["default", "myns"])
+        self.assertCountEqual(
+            csecs_cache.get_cluster_secret("mysecretuid").synced_namespace,
+            ["default", "myns"],
+        )
+
     def test_startup_fn(self):
         """Must not fail on empty namespace in ClusterSecret metadata (it's cluster-wide after all).
         """
@@ -278,7 +747,12 @@ class TestClusterSecretHandler(unittest.TestCase):
             "status": {"create_fn": {"syncedns": []}}
         }]
 
-        with patch("handlers.get_custom_objects_by_kind", get_custom_objects_by_kind):
+        mock_v1 = Mock()
+        mock_v1.list_namespace.return_value.items = [Mock(metadata=V1ObjectMeta(name=ns)) for ns in ["default", "myns"]]
+
+        with patch("handlers.v1", mock_v1), \
+             patch("handlers.v1_write", mock_v1), \
+             patch("handlers.get_custom_objects_by_kind", get_custom_objects_by_kind):
             asyncio.run(startup_fn(logger=self.logger))
 
         # The secret should be in the cache.
@@ -287,6 +761,9 @@ class TestClusterSecretHandler(unittest.TestCase):
             csec.uid,
         )
 
+        # The namespaces should be in the cache.
+        self.assertEqual(namespaces_cache.names(), ["default", "myns"])
+
     def test_on_secret_change(self):
         """Must sync changes from source secret to target namespaces.
         """
@@ -322,8 +799,9 @@ class TestClusterSecretHandler(unittest.TestCase):
         }
 
         with patch("handlers.v1", mock_v1), \
+             patch("handlers.v1_write", mock_v1), \
              patch("handlers.sync_secret", sync_secret_mock):
-            on_secret_event(
+            on_source_secret_event(
                 event=event,
                 logger=self.logger
             )
@@ -332,7 +810,7 @@ class TestClusterSecretHandler(unittest.TestCase):
         # Handler uses kubernetes_body which includes all fields
         expected_body = csec.kubernetes_body
         sync_secret_mock.assert_called_once_with(
-            self.logger, "target-ns", expected_body, mock_v1
+            self.logger, "target-ns", expected_body, mock_v1, mock_v1
         )
 
     def test_on_managed_secret_delete(self):
@@ -369,8 +847,9 @@ class TestClusterSecretHandler(unittest.TestCase):
         mock_v1.read_namespace.return_value = mock_ns
 
         with patch("handlers.v1", mock_v1), \
+             patch("handlers.v1_write", mock_v1), \
              patch("handlers.sync_secret", sync_secret_mock):
-            on_secret_event(
+            on_managed_secret_event(
                 event=event,
                 logger=self.logger
             )
@@ -378,7 +857,7 @@ class TestClusterSecretHandler(unittest.TestCase):
         # Should trigger sync to restore
         expected_body = csec.kubernetes_body
         sync_secret_mock.assert_called_once_with(
-            self.logger, "target-ns", expected_body, mock_v1
+            self.logger, "target-ns", expected_body, mock_v1, mock_v1
         )
 
     def test_on_source_secret_delete_warning(self):
@@ -414,7 +893,7 @@ class TestClusterSecretHandler(unittest.TestCase):
             }
         }
 
-        on_secret_event(
+        on_source_secret_event(
             event=event,
             logger=logger_mock
         )
@@ -422,3 +901,165 @@ class TestClusterSecretHandler(unittest.TestCase):
         # Should log a warning
         logger_mock.warning.assert_called()
         self.assertIn("was deleted!", logger_mock.warning.call_args[0][0])
+
+    def test_cache_indexes(self):
+        """Source and name indexes must follow cache updates and removals.
+        """
+        csec = BaseClusterSecret(
+            uid="csec-uid",
+            name="csec-name",
+            metadata={"name": "csec-name", "uid": "csec-uid"},
+            data={"valueFrom": {"secretKeyRef": {"name": "source-secret", "namespace": "source-ns"}}},
+            synced_namespace=["target-ns"],
+        )
+        csecs_cache.set_cluster_secret(csec)
+
+        self.assertEqual(csecs_cache.get_by_source("source-secret", "source-ns"), [csec])
+        self.assertIs(csecs_cache.get_by_name("csec-name"), csec)
+
+        # Switching to inline data must drop the source index entry.
+        updated = BaseClusterSecret(
+            uid="csec-uid",
+            name="csec-name",
+            metadata={"name": "csec-name", "uid": "csec-uid"},
+            data={"key": "value"},
+            synced_namespace=["target-ns"],
+        )
+        csecs_cache.set_cluster_secret(updated)
+
+        self.assertEqual(csecs_cache.get_by_source("source-secret", "source-ns"), [])
+        self.assertIs(csecs_cache.get_by_name("csec-name"), updated)
+
+        csecs_cache.remove_cluster_secret("csec-uid")
+
+        self.assertIsNone(csecs_cache.get_by_name("csec-name"))
+
+    def test_kubernetes_body_cache(self):
+        """kubernetes_body must be built once and rebuilt after the cache is updated.
+        """
+        csec = BaseClusterSecret(
+            uid="csec-uid",
+            name="csec-name",
+            metadata={"name": "csec-name", "uid": "csec-uid"},
+            data={"key": "oldvalue"},
+            synced_namespace=["target-ns"],
+        )
+        body = csec.kubernetes_body
+        self.assertIs(csec.kubernetes_body, body)
+
+        csec.data = {"key": "newvalue"}
+        csecs_cache.set_cluster_secret(csec)
+
+        self.assertEqual(csec.kubernetes_body["data"], {"key": "newvalue"})
+
+    def test_cache_snapshot(self):
+        """all_cluster_secret must return a snapshot that is not affected by later updates.
+        """
+        csec = BaseClusterSecret(
+            uid="csec-uid",
+            name="csec-name",
+            metadata={"name": "csec-name", "uid": "csec-uid"},
+            data={"key": "value"},
+            synced_namespace=[],
+        )
+        snapshot = csecs_cache.all_cluster_secret()
+        csecs_cache.set_cluster_secret(csec)
+
+        self.assertEqual(len(snapshot), 0)
+        self.assertEqual(list(csecs_cache.all_cluster_secret()), [csec])
+
+    def test_on_managed_secret_delete_burst(self):
+        """Self-healing must read the namespace phase once for a burst of deletes in one namespace.
+        """
+        mock_v1 = Mock()
+        sync_secret_mock = Mock()
+        from consts import CREATE_BY_ANNOTATION, CREATE_BY_AUTHOR
+
+        for index in range(3):
+            csecs_cache.set_cluster_secret(BaseClusterSecret(
+                uid=f"csec-uid-{index}",
+                name=f"managed-secret-{index}",
+                metadata={"name": f"managed-secret-{index}", "uid": f"csec-uid-{index}"},
+                data={"key": "value"},
+                synced_namespace=["target-ns"],
+            ))
+
+        mock_ns = Mock()
+        mock_ns.status.phase = 'Terminating'
+        mock_v1.read_namespace.return_value = mock_ns
+
+        with patch("handlers.v1", mock_v1), \
+             patch("handlers.v1_write", mock_v1), \
+             patch("handlers.sync_secret", sync_secret_mock):
+            for index in range(3):
+                on_managed_secret_event(
+                    event={
+                        'type': 'DELETED',
+                        'object': {
+                            'metadata': {
+                                'name': f'managed-secret-{index}',
+                                'namespace': 'target-ns',
+                                'annotations': {CREATE_BY_ANNOTATION: CREATE_BY_AUTHOR},
+                                'labels': {}
+                            }
+                        }
+                    },
+                    logger=self.logger
+                )
+
+        mock_v1.read_namespace.assert_called_once_with(name='target-ns')
+        sync_secret_mock.assert_not_called()
+
+    def test_cache_bulk_load(self):
+        """bulk_load must replace the cache content and build the indexes.
+        """
+        csecs_cache.set_cluster_secret(BaseClusterSecret(
+            uid="old-uid",
+            name="old-name",
+            metadata={"name": "old-name", "uid": "old-uid"},
+            data={"key": "value"},
+            synced_namespace=[],
+        ))
+        csec = BaseClusterSecret(
+            uid="csec-uid",
+            name="csec-name",
+            metadata={"name": "csec-name", "uid": "csec-uid"},
+            data={"valueFrom": {"secretKeyRef": {"name": "source-secret", "namespace": "source-ns"}}},
+            synced_namespace=["target-ns"],
+        )
+
+        csecs_cache.bulk_load([csec])
+
+        self.assertEqual(list(csecs_cache.all_cluster_secret()), [csec])
+        self.assertIsNone(csecs_cache.get_by_name("old-name"))
+        self.assertIs(csecs_cache.get_by_name("csec-name"), csec)
+        self.assertEqual(csecs_cache.get_by_source("source-secret", "source-ns"), [csec])
+
+    def test_is_source_secret(self):
+        """Only secrets referenced by a valueFrom must pass the source secret filter.
+        """
+        csecs_cache.set_cluster_secret(BaseClusterSecret(
+            uid="csec-uid",
+            name="csec-name",
+            metadata={"name": "csec-name", "uid": "csec-uid"},
+            data={"valueFrom": {"secretKeyRef": {"name": "source-secret", "namespace": "source-ns"}}},
+            synced_namespace=["target-ns"],
+        ))
+
+        self.assertTrue(is_source_secret(name="source-secret", namespace="source-ns"))
+        self.assertFalse(is_source_secret(name="source-secret", namespace="other-ns"))
+        self.assertFalse(is_source_secret(name="sh.helm.release.v1.app.v1", namespace="source-ns"))
+
+    def test_synced_namespace_forms(self):
+        """synced_namespace must be a sorted tuple with a matching precomputed set.
+        """
+        csec = BaseClusterSecret(
+            uid="csec-uid",
+            name="csec-name",
+            metadata={"name": "csec-name", "uid": "csec-uid"},
+            data={"key": "value"},
+            synced_namespace=["ns2", "ns1", "ns2"],
+        )
+
+        self.assertEqual(csec.synced_namespace, ("ns1", "ns2"))
+        self.assertEqual(csec.synced_namespace_set, frozenset(["ns1", "ns2"]))
@@ -4,11 +4,11 @@ import unittest
 from typing import Tuple, Callable, Union
 from unittest.mock import Mock
 
-from kubernetes.client import V1ObjectMeta
+from kubernetes.client import ApiException, V1ObjectMeta
 
 from consts import CREATE_BY_ANNOTATION, LAST_SYNC_ANNOTATION, VERSION_ANNOTATION, BLOCKED_ANNOTATIONS, \
     CREATE_BY_AUTHOR, CLUSTER_SECRET_LABEL
-from kubernetes_utils import get_ns_list, create_secret_metadata, sync_secret
+from kubernetes_utils import get_ns_list, create_secret_metadata, sync_secret, patch_clustersecret_status
 from os_utils import get_version, get_blocked_labels
 
 USER_NAMESPACE_COUNT = 10
@@ -197,3 +197,54 @@ class TestClusterSecret(unittest.TestCase):
         self.assertFalse(mock_v1.replace_namespaced_secret.called)
         # Should have logged that it's skipping
         self.assertIn("is terminating. Skipping sync", logger_mock.info.call_args[0][0])
+
+    def test_sync_secret_writes_with_write_client(self):
+        """Must read with v1 and create the secret with v1_write.
+        """
+        mock_v1 = Mock()
+        mock_v1_write = Mock()
+        logger_mock = Mock()
+
+        mock_ns = Mock()
+        mock_ns.status.phase = 'Active'
+        mock_v1.read_namespace.return_value = mock_ns
+        mock_v1.read_namespaced_secret.side_effect = ApiException(status=404)
+
+        body = {
+            'metadata': {'name': 'mysecret'},
+            'data': {'key': 'value'}
+        }
+
+        sync_secret(
+            logger=logger_mock,
+            namespace='myns',
+            body=body,
+            v1=mock_v1,
+            v1_write=mock_v1_write,
+        )
+
+        mock_v1.read_namespaced_secret.assert_called_once_with('mysecret', 'myns')
+        mock_v1_write.create_namespaced_secret.assert_called_once()
+        self.assertFalse(mock_v1.create_namespaced_secret.called)
+
+    def test_patch_clustersecret_status(self):
+        """Must patch only the status, without reading the object first.
+        """
+        mock_custom_objects_api = Mock()
+
+        patch_clustersecret_status(
+            logger=Mock(),
+            name='mysecret',
+            new_status={'create_fn': {'syncedns': ['myns']}},
+            custom_objects_api=mock_custom_objects_api,
+        )
+
+        mock_custom_objects_api.get_cluster_custom_object.assert_not_called()
+        mock_custom_objects_api.patch_cluster_custom_object.assert_called_once_with(
+            group='clustersecret.io',
+            version='v1',
+            plural='clustersecrets',
+            name='mysecret',
+            body={'status': {'create_fn': {'syncedns': ['myns']}}},
+            field_manager='clustersecret',
+        )